@@ -2,8 +2,11 @@ from typing import List, Dict, Any, Generator, AsyncGenerator
 import os
 import random
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-import time
+import queue
+import threading
+
+from .resilience import ResilientCaller
+from .transport import HTTPTransport
 
 # Load environment variables from .env file if it exists
 try:
@@ -29,9 +32,22 @@ class AgentService:
         # Initialize conversation storage
         self.conversations = {}
         
+        # Shared pooled HTTP client for provider requests
+        self.transport = HTTPTransport()
+        
+        # Retries, deadline and circuit breaker for provider calls
+        self.resilience = ResilientCaller()
+        
+        # Background event loop that drives the async engine for sync callers
+        self.sync_queue_size = int(os.getenv("SYNC_QUEUE_SIZE", "64"))
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        
         if llm_provider == "openai":
             # Check if we can import the OpenAI module
             try:
+                import openai
                 from langchain_openai import ChatOpenAI
             except ImportError:
                 raise ImportError("langchain-openai package is required for OpenAI provider. Install with: pip install langchain-openai")
@@ -41,10 +57,20 @@ class AgentService:
                 raise ValueError("OPENAI_API_KEY environment variable is required when LLM_PROVIDER=openai")
             
             model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+            # Route async completions through the shared pooled client;
+            # retries are handled by self.resilience
+            async_client = openai.AsyncOpenAI(
+                api_key=api_key,
+                http_client=self.transport.client,
+                timeout=self.transport.config.timeout,
+                max_retries=0
+            )
             self.llm = ChatOpenAI(
                 model=model,
                 temperature=0.7,
-                api_key=api_key
+                api_key=api_key,
+                max_retries=0,
+                async_client=async_client.chat.completions
             )
             self.use_real_llm = True
             print(f"Initialized OpenAI provider with model: {model}")
@@ -61,11 +87,16 @@ class AgentService:
                 raise ValueError("GEMINI_API_KEY environment variable is required when LLM_PROVIDER=gemini")
             
             model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+            # google-generativeai manages its own persistent gRPC (HTTP/2) channel and
+            # does not accept an httpx client, so it does not use self.transport
             self.llm = ChatGoogleGenerativeAI(
                 model=model,
                 temperature=0.7,
                 google_api_key=api_key
             )
+            # langchain-google-genai retries internally and cannot be configured not to,
+            # so only the deadline and circuit breaker apply on top of it
+            self.resilience.config.max_attempts = 1
             self.use_real_llm = True
             print(f"Initialized Gemini provider with model: {model}")
         
@@ -133,15 +164,6 @@ class AgentService:
         ]
         return random.choice(responses)
     
-    def _simulate_token_streaming(self, response_text: str) -> Generator[str, None, None]:
-        """Simulate token streaming by breaking response into chunks"""
-        # Break the response into words and yield them one by one with small delays
-        words = response_text.split()
-        for i, word in enumerate(words):
-            yield word + (" " if i < len(words) - 1 else "")
-            # Add a small delay to simulate streaming
-            time.sleep(0.02)
-    
     async def _simulate_token_streaming_async(self, response_text: str) -> AsyncGenerator[str, None]:
         """Async version to simulate token streaming by breaking response into chunks"""
         # Break the response into words and yield them one by one with small delays
@@ -151,42 +173,91 @@ class AgentService:
             # Add a small async delay to simulate streaming
             await asyncio.sleep(0.02)
     
-    def process_messages(self, messages: List[Dict[str, str]]) -> Generator[str, None, None]:
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background event loop used by the sync API if needed"""
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="agent-service-loop", daemon=True)
+                thread.start()
+                self._loop = loop
+                self._loop_thread = thread
+            return self._loop
+    
+    def transport_stats(self) -> Dict[str, Any]:
+        """Connection pool statistics for the provider HTTP client"""
+        return self.transport.stats()
+    
+    async def aclose(self):
+        """Close the shared provider HTTP client"""
+        await self.transport.aclose()
+    
+    def close(self):
+        """Stop the background event loop used by the sync API"""
+        with self._loop_lock:
+            loop, thread = self._loop, self._loop_thread
+            self._loop = None
+            self._loop_thread = None
+        if loop is None:
+            return
+        
+        async def shutdown():
+            pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await self.transport.aclose_loop_pool()
+        
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+    
+    def process_messages(self, messages: List[Dict[str, str]], conversation_id: str = "default") -> Generator[str, None, None]:
         """
-        Process a list of messages and yield token deltas for SSE streaming
+        Sync facade over aprocess_messages for scripts and worker threads.
+        
+        The generation runs on a shared background event loop and chunks are
+        handed back through a bounded queue, so many threads can generate
+        concurrently with the same history behavior as the async API.
         """
-        # Get the latest user message as input
-        if messages and messages[-1]["role"] == "user":
-            user_input = messages[-1]["content"]
-        else:
-            user_input = "Hello"  # Default input if no user message is provided
+        loop = self._ensure_loop()
+        chunks = queue.Queue()
+        done = object()
+        cancelled = object()
+        # Producer may run at most sync_queue_size chunks ahead of the consumer
+        credits = asyncio.Semaphore(max(1, self.sync_queue_size))
         
-        if self.use_real_llm:
-            # Use real LLM if available
+        async def pump():
             try:
-                from langchain_core.messages import HumanMessage
-                from langchain_core.prompts import ChatPromptTemplate
-                
-                # Create a simple prompt
-                prompt = ChatPromptTemplate.from_messages([
-                    ("system", "You are a helpful AI assistant. Respond concisely and accurately."),
-                    ("human", "{input}")
-                ])
-                
-                chain = prompt | self.llm
-                response = chain.invoke({"input": user_input})
-                
-                # Simulate token streaming by breaking the response into chunks
-                response_text = response.content if hasattr(response, 'content') else str(response)
-                yield from self._simulate_token_streaming(response_text)
+                async for chunk in self.aprocess_messages(messages, conversation_id):
+                    await credits.acquire()
+                    chunks.put_nowait(chunk)
+            except asyncio.CancelledError:
+                # close() stopped the generation; the consumer must not mistake this for the end
+                chunks.put_nowait(cancelled)
+                raise
             except Exception as e:
-                # Fallback to mock response if real LLM fails
-                response_text = f"Mock response: {self._generate_mock_response(user_input)}"
-                yield from self._simulate_token_streaming(response_text)
-        else:
-            # Use mock response
-            response_text = self._generate_mock_response(user_input)
-            yield from self._simulate_token_streaming(response_text)
+                chunks.put_nowait(e)
+            else:
+                chunks.put_nowait(done)
+        
+        future = asyncio.run_coroutine_threadsafe(pump(), loop)
+        try:
+            while True:
+                item = chunks.get()
+                if item is done:
+                    break
+                if item is cancelled:
+                    raise RuntimeError("Generation was cancelled because the AgentService was closed")
+                if isinstance(item, Exception):
+                    raise item
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(credits.release)
+                yield item
+        finally:
+            # Stop the generation if the caller abandoned the stream early
+            future.cancel()
     
     async def aprocess_messages(self, messages: List[Dict[str, str]], conversation_id: str = "default") -> AsyncGenerator[str, None]:
         """
@@ -205,49 +276,40 @@ class AgentService:
             user_input = "Hello"  # Default input if no user message is provided
         
         if self.use_real_llm:
-            # Use real LLM if available
-            try:
-                from langchain_core.messages import HumanMessage, SystemMessage
-                from langchain_core.prompts import ChatPromptTemplate
-                
-                # Create a prompt with conversation history
-                formatted_messages = []
-                formatted_messages.append(("system", "You are a helpful AI assistant. Respond concisely and accurately."))
-                
-                # Add conversation history
-                for msg in all_messages:
-                    role = msg["role"]
-                    content = msg["content"]
-                    formatted_messages.append((role, content))
-                
-                prompt = ChatPromptTemplate.from_messages(formatted_messages)
-                
-                chain = prompt | self.llm
-                response = chain.invoke({})
-                
-                # Simulate token streaming by breaking the response into chunks
-                response_text = response.content if hasattr(response, 'content') else str(response)
-                
-                # Update conversation history after response
-                self.update_conversation_history(conversation_id, all_messages + [{"role": "assistant", "content": response_text}])
-                
-                async for chunk in self._simulate_token_streaming_async(response_text):
-                    yield chunk
-            except Exception as e:
-                # Fallback to mock response if real LLM fails
-                response_text = f"Mock response: {self._generate_mock_response(user_input)}"
-                
-                # Update conversation history after response
-                self.update_conversation_history(conversation_id, all_messages + [{"role": "assistant", "content": response_text}])
-                
-                async for chunk in self._simulate_token_streaming_async(response_text):
-                    yield chunk
+            # Use real LLM if available; provider failures surface as ProviderError
+            from langchain_core.prompts import ChatPromptTemplate
+            
+            # Create a prompt with conversation history
+            formatted_messages = []
+            formatted_messages.append(("system", "You are a helpful AI assistant. Respond concisely and accurately."))
+            
+            # Add conversation history
+            for msg in all_messages:
+                role = msg["role"]
+                content = msg["content"]
+                formatted_messages.append((role, content))
+            
+            prompt = ChatPromptTemplate.from_messages(formatted_messages)
+            
+            chain = prompt | self.llm
+            response = await self.resilience.call(lambda: chain.ainvoke({}))
+            
+            # Simulate token streaming by breaking the response into chunks
+            response_text = response.content if hasattr(response, 'content') else str(response)
+            
+            async for chunk in self._simulate_token_streaming_async(response_text):
+                yield chunk
+            
+            # Update conversation history once the whole response has been delivered,
+            # so a cancelled or abandoned turn leaves no reply the client never saw
+            self.update_conversation_history(conversation_id, all_messages + [{"role": "assistant", "content": response_text}])
         else:
             # Use mock response
             response_text = self._generate_mock_response(user_input)
             
-            # Update conversation history after response
-            self.update_conversation_history(conversation_id, all_messages + [{"role": "assistant", "content": response_text}])
-            
             async for chunk in self._simulate_token_streaming_async(response_text):
-                yield chunk
\ No newline at end of file
+                yield chunk
+            
+            # Update conversation history once the whole response has been delivered,
+            # so a cancelled or abandoned turn leaves no reply the client never saw
+            self.update_conversation_history(conversation_id, all_messages + [{"role": "assistant", "content": response_text}])
\ No newline at end of file
@@ -0,0 +1,206 @@
+from typing import Awaitable, Callable, Optional, TypeVar
+from dataclasses import dataclass
+import os
+import asyncio
+import random
+import time
+
+import httpx
+
+T = TypeVar("T")
+
+# HTTP status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class ProviderError(Exception):
+    """Raised when the LLM provider cannot produce a response"""
+
+    code = "provider_error"
+
+    def __init__(self, message: str, transient: bool = False):
+        super().__init__(message)
+        # Whether the failure reflects provider health, for the circuit breaker
+        self.transient = transient
+
+
+class CircuitOpenError(ProviderError):
+    """Raised without calling the provider while the circuit breaker is open"""
+
+    code = "provider_unavailable"
+
+
+class DeadlineExceededError(ProviderError):
+    """Raised when a request runs past its end-to-end deadline"""
+
+    code = "deadline_exceeded"
+
+    def __init__(self, message: str):
+        super().__init__(message, transient=True)
+
+
+def error_code(error: BaseException) -> str:
+    """Short code for reporting an error to clients"""
+    return error.code if isinstance(error, ProviderError) else "internal_error"
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a provider error is transient and worth retrying"""
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError, ConnectionError)):
+        return True
+
+    # openai.APIStatusError exposes status_code, google.api_core errors expose code
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS_CODES
+
+    # openai wraps transport failures in APIConnectionError / APITimeoutError
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(error, openai.APIConnectionError)
+
+
+@dataclass
+class ResilienceConfig:
+    """
+    Retry, deadline and circuit breaker settings for provider calls
+    """
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    deadline: float = 60.0
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "ResilienceConfig":
+        """Build a config from LLM_* environment variables"""
+        return cls(
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", cls.max_attempts)),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE", cls.backoff_base)),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX", cls.backoff_max)),
+            deadline=float(os.getenv("LLM_REQUEST_DEADLINE", cls.deadline)),
+            failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", cls.failure_threshold)),
+            reset_timeout=float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", cls.reset_timeout)),
+        )
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated provider failures.
+
+    Failures are counted per request, after its retries are used up. After
+    failure_threshold consecutive failed requests the circuit opens and calls
+    are rejected until reset_timeout has passed. Then a single trial call is
+    let through: success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def release(self):
+        """End a call that says nothing about provider health"""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._trial_in_flight or self._failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+        self._trial_in_flight = False
+
+
+class ResilientCaller:
+    """
+    Runs provider calls with bounded retries, jittered exponential backoff,
+    a per-request deadline and a shared circuit breaker
+    """
+
+    def __init__(self, config: Optional[ResilienceConfig] = None):
+        self.config = config or ResilienceConfig.from_env()
+        self.breaker = CircuitBreaker(self.config.failure_threshold, self.config.reset_timeout)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number `attempt` (1-based)"""
+        ceiling = min(self.config.backoff_max, self.config.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    async def call(self, operation: Callable[[], Awaitable[T]]) -> T:
+        """Run operation, retrying transient failures until the deadline"""
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM provider is temporarily unavailable")
+
+        try:
+            result = await self._call_with_retries(operation)
+        except ProviderError as e:
+            # One failed request counts once, however many attempts it made
+            if e.transient:
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+            raise
+        except BaseException:
+            # Cancelled by the client; the provider was not at fault
+            self.breaker.release()
+            raise
+
+        self.breaker.record_success()
+        return result
+
+    async def _call_with_retries(self, operation: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.config.deadline
+        attempt = 0
+
+        while True:
+            attempt += 1
+            remaining = deadline - loop.time()
+            try:
+                return await asyncio.wait_for(operation(), timeout=max(remaining, 0))
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError) and loop.time() >= deadline:
+                    raise DeadlineExceededError(f"LLM request exceeded its {self.config.deadline}s deadline") from e
+                # Only transient errors count against provider health; a bad request does not
+                retryable = is_retryable(e)
+                if attempt >= self.config.max_attempts or not retryable:
+                    raise ProviderError(f"LLM provider request failed: {e}", transient=retryable) from e
+
+                delay = self.backoff(attempt)
+                if loop.time() + delay >= deadline:
+                    raise DeadlineExceededError(f"LLM request exceeded its {self.config.deadline}s deadline") from e
+                await asyncio.sleep(delay)
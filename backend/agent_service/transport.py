@@ -0,0 +1,196 @@
+from typing import Dict, Any, Optional
+from dataclasses import dataclass
+import os
+import asyncio
+import weakref
+
+import httpx
+
+
+@dataclass
+class TransportConfig:
+    """
+    Connection pool and timeout settings for provider HTTP clients
+    """
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    # Defaults to read_timeout. Non-streamed completions send their headers only
+    # once generation has finished, so this bounds the whole completion.
+    first_byte_timeout: Optional[float] = None
+    http2: bool = False
+
+    def __post_init__(self):
+        if self.first_byte_timeout is None:
+            self.first_byte_timeout = self.read_timeout
+
+    @classmethod
+    def from_env(cls) -> "TransportConfig":
+        """Build a config from HTTP_* environment variables"""
+        return cls(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", cls.max_connections)),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", cls.max_keepalive_connections)),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", cls.keepalive_expiry)),
+            connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", cls.connect_timeout)),
+            read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", cls.read_timeout)),
+            first_byte_timeout=float(os.environ["HTTP_FIRST_BYTE_TIMEOUT"]) if os.getenv("HTTP_FIRST_BYTE_TIMEOUT") else None,
+            http2=os.getenv("HTTP_HTTP2", "").lower() in ["1", "true", "yes"],
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.read_timeout,
+            pool=self.connect_timeout,
+        )
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+class _PooledTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps httpx's pooled transport to enforce a first-byte timeout
+    and keep counters for pool stats.
+
+    Pooled connections belong to the event loop that opened them, so one
+    pool is kept per running loop. This lets the server loop and the
+    AgentService background loop share a single client.
+    """
+
+    def __init__(self, config: TransportConfig):
+        self._config = config
+        self._pools = weakref.WeakKeyDictionary()
+        self._seen_connections = set()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def _pool_for_running_loop(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        # Connections on a closed loop can never be reused
+        for closed in [other for other in self._pools if other.is_closed()]:
+            del self._pools[closed]
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = httpx.AsyncHTTPTransport(
+                http2=self._config.http2,
+                limits=self._config.limits,
+            )
+            self._pools[loop] = pool
+        return pool
+
+    @property
+    def _connections(self):
+        # httpcore keeps the live connections on the pool; not part of httpx's public API
+        connections = []
+        for pool in list(self._pools.values()):
+            connections.extend(getattr(getattr(pool, "_pool", None), "connections", []))
+        return connections
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        pool = self._pool_for_running_loop()
+        timeout = self._config.first_byte_timeout
+        try:
+            # Resolves once the status line and headers arrive; the body streams afterwards
+            return await asyncio.wait_for(pool.handle_async_request(request), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise httpx.ReadTimeout(
+                f"No response within first-byte timeout of {timeout}s",
+                request=request,
+            )
+        finally:
+            self._track_connections()
+
+    def _track_connections(self):
+        current = {id(conn) for conn in self._connections}
+        self.connections_opened += len(current - self._seen_connections)
+        self._seen_connections = current
+
+    def stats(self) -> Dict[str, Any]:
+        connections = self._connections
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+        }
+
+    async def aclose_loop_pool(self):
+        """Close the pool that belongs to the running loop"""
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.aclose()
+
+    async def aclose(self):
+        # Pools on other loops cannot be closed from here; they are dropped with their loop
+        await self.aclose_loop_pool()
+        self._pools.clear()
+
+
+class HTTPTransport:
+    """
+    Shared pooled async HTTP client for provider ChatModels.
+
+    The client is created on first use and reuses keep-alive connections
+    across requests. It may be used from several event loops; each loop
+    gets its own connection pool.
+    """
+
+    def __init__(self, config: Optional[TransportConfig] = None):
+        self.config = config or TransportConfig.from_env()
+        self._client = None
+        self._transport = None
+
+        if self.config.http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                raise ImportError("h2 package is required for HTTP/2 support. Install with: pip install httpx[http2]")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared async client, created on first access"""
+        if self._client is None:
+            self._transport = _PooledTransport(self.config)
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=self.config.timeout,
+            )
+        return self._client
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection pool statistics"""
+        stats = {
+            "http2": self.config.http2,
+            "max_connections": self.config.max_connections,
+            "max_keepalive_connections": self.config.max_keepalive_connections,
+        }
+        if self._transport is None:
+            stats.update(requests=0, connections_opened=0, connections=0, idle_connections=0, active_connections=0)
+        else:
+            stats.update(self._transport.stats())
+        return stats
+
+    async def aclose_loop_pool(self):
+        """Close pooled connections opened on the running loop, keeping the client usable"""
+        if self._transport is not None:
+            await self._transport.aclose_loop_pool()
+
+    async def aclose(self):
+        """Close the shared client and all pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._transport = None
@@ -0,0 +1,75 @@
+"""Benchmark /a2a/messages request parsing on large conversation threads"""
+
+import json
+import timeit
+
+from server.schemas import parse_messages_request, messages_request_adapter
+
+
+def build_body(message_count: int, message_chars: int) -> bytes:
+    """Build a request body resembling a long assistant-ui thread"""
+    messages = []
+    for i in range(message_count):
+        role = "user" if i % 2 == 0 else "assistant"
+        content = [{"type": "text", "text": "x" * message_chars}] if role == "user" else "y" * message_chars
+        messages.append({"id": f"msg-{i}", "role": role, "content": content})
+    return json.dumps({"messages": messages}).encode()
+
+
+def parse_legacy(body: bytes):
+    """The previous path: json.loads followed by a per-message dict check"""
+    messages = json.loads(body).get("messages", [])
+    for msg in messages:
+        if "role" not in msg or "content" not in msg:
+            raise ValueError("Each message must have 'role' and 'content'")
+    return messages
+
+
+def parse_typed(body: bytes):
+    """The current path: orjson decode plus typed validation and content flattening"""
+    return parse_messages_request(body)
+
+
+def parse_validate_json(body: bytes):
+    """pydantic-core decoding and validating straight from bytes, for comparison"""
+    return messages_request_adapter.validate_json(body)
+
+
+def _reject(body: bytes):
+    try:
+        parse_messages_request(body)
+    except ValueError:
+        # ValidationError and PayloadTooLargeError are both ValueErrors
+        return
+    raise AssertionError("body was expected to be rejected")
+
+
+def _time(function, body: bytes) -> float:
+    runs = 100
+    return min(timeit.repeat(lambda: function(body), number=runs, repeat=15)) / runs
+
+
+def main():
+    # Threads that fit within the default MAX_MESSAGES and MAX_TOTAL_CHARS limits
+    for message_count, message_chars in [(10, 200), (200, 200), (100, 1500)]:
+        body = build_body(message_count, message_chars)
+        print(f"\n=== {message_count} messages x {message_chars} chars ({len(body) / 1024:.0f} KiB) ===")
+        for name, parse in [
+            ("json.loads + dict checks", parse_legacy),
+            ("parse_messages_request", parse_typed),
+            ("validate_json", parse_validate_json),
+        ]:
+            print(f"{name:<26} {_time(parse, body) * 1e6:10.1f} us/request")
+
+    # Rejected payloads; bodies over MAX_BODY_BYTES never reach the parser
+    print("\n=== rejects ===")
+    rejects = [
+        ("invalid role", b'{"messages": [{"role": "robot", "content": "hi"}]' + b" " * 100_000 + b"}"),
+        ("over MAX_TOTAL_CHARS", build_body(200, 4000)),
+    ]
+    for name, body in rejects:
+        print(f"{name:<26} {_time(_reject, body) * 1e6:10.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
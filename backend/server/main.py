@@ -1,10 +1,22 @@
-from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi import FastAPI, HTTPException, Request, Query, WebSocket
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
 from typing import Dict, List, Any
 import json
 import asyncio
 from agent_service.agent import AgentService
+from agent_service.resilience import error_code
+from server.schemas import (
+    parse_messages_request,
+    is_too_long,
+    PayloadTooLargeError,
+    MAX_BODY_BYTES,
+    MAX_MESSAGES,
+    MAX_MESSAGE_CHARS,
+)
+from server.websocket import WebSocketSession
 
 app = FastAPI(
     title="A2A Agent Service API",
@@ -44,6 +56,22 @@ async def get_models():
         # Return mock models when using mock responses
         return {"models": ["mock-model"]}
 
+@app.get("/a2a/transport/stats")
+async def get_transport_stats():
+    """
+    Return connection pool statistics for the provider HTTP client
+    """
+    return agent_service.transport_stats()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Close pooled provider connections and the sync API event loop
+    """
+    # close() releases the background loop's pool, which aclose() would orphan by dropping the client
+    await asyncio.to_thread(agent_service.close)
+    await agent_service.aclose()
+
 @app.delete("/a2a/conversations/{conversation_id}")
 async def reset_conversation(conversation_id: str):
     """
@@ -52,53 +80,79 @@ async def reset_conversation(conversation_id: str):
     agent_service.reset_conversation(conversation_id)
     return {"message": f"Conversation {conversation_id} reset successfully"}
 
+async def read_messages_request(request: Request) -> List[Dict[str, str]]:
+    """
+    Read and validate a /a2a/messages body.
+    Oversized bodies are rejected before they are buffered or parsed.
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {MAX_BODY_BYTES} bytes")
+    
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {MAX_BODY_BYTES} bytes")
+        chunks.append(chunk)
+    
+    try:
+        messages = parse_messages_request(b"".join(chunks))
+    except ValidationError as e:
+        if is_too_long(e):
+            raise HTTPException(status_code=413, detail=f"Too many messages or message too long (max {MAX_MESSAGES} messages, {MAX_MESSAGE_CHARS} characters each)")
+        raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors(include_url=False, include_input=False)))
+    except PayloadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be valid JSON")
+    
+    return messages
+
 @app.post("/a2a/messages")
 async def handle_messages(
     request: Request,
-    conversation_id: str = Query("default", description="Conversation ID to maintain context")
+    conversation_id: str = Query("default", max_length=128, description="Conversation ID to maintain context")
 ):
     """
     Main endpoint for handling chat messages
     Request: {"messages": [{"role": "user", "content": "string"}]}
     Response: SSE stream with token deltas
     """
-    try:
-        # Parse the request body
-        body = await request.json()
-        messages = body.get("messages", [])
-        
-        if not messages:
-            raise HTTPException(status_code=400, detail="Messages list cannot be empty")
-        
-        # Validate message format
-        for msg in messages:
-            if "role" not in msg or "content" not in msg:
-                raise HTTPException(status_code=400, detail="Each message must have 'role' and 'content'")
-        
-        # Create a streaming response
-        async def event_generator():
-            try:
-                # Process messages and stream the response
-                async for chunk in agent_service.aprocess_messages(messages, conversation_id):
-                    # Format as SSE: data: <content>\n\n
-                    yield f"data: {chunk}\n\n"
-                # Send a completion message to signal end of stream
-                yield f"data: [DONE]\n\n"
-            except Exception as e:
-                # Send error as SSE data if something goes wrong during streaming
-                yield f"data: Error occurred: {str(e)}\n\n"
-        
-        return StreamingResponse(
-            event_generator(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Access-Control-Allow-Origin": "*",
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+    messages = await read_messages_request(request)
+    
+    # Create a streaming response
+    async def event_generator():
+        try:
+            # Process messages and stream the response
+            async for chunk in agent_service.aprocess_messages(messages, conversation_id):
+                # Format as SSE: data: <content>\n\n
+                yield f"data: {chunk}\n\n"
+            # Send a completion message to signal end of stream
+            yield f"data: [DONE]\n\n"
+        except Exception as e:
+            # Send a typed SSE error event if something goes wrong during streaming
+            error = {"error": error_code(e), "message": str(e)}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Access-Control-Allow-Origin": "*",
+        }
+    )
+
+@app.websocket("/a2a/ws")
+async def websocket_messages(websocket: WebSocket):
+    """
+    Multiplexed endpoint for many concurrent conversation turns over one connection
+    Frames: see server.websocket.WebSocketSession
+    """
+    await WebSocketSession(websocket, agent_service).run()
 
 if __name__ == "__main__":
     import uvicorn
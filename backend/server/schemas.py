@@ -0,0 +1,120 @@
+from typing import Annotated, Any, Dict, List, Literal, Union
+from typing_extensions import NotRequired, TypedDict
+import json
+import os
+
+from pydantic import Field, TypeAdapter, ValidationError
+
+# orjson is a listed dependency; fall back to the stdlib decoder if it is missing
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# Request size limits for /a2a/messages
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", 1024 * 1024))
+MAX_MESSAGES = int(os.getenv("MAX_MESSAGES", 200))
+MAX_MESSAGE_CHARS = int(os.getenv("MAX_MESSAGE_CHARS", 32_000))
+MAX_TOTAL_CHARS = int(os.getenv("MAX_TOTAL_CHARS", 200_000))
+MAX_CONTENT_PARTS = 64
+
+
+# TypedDicts rather than BaseModels: validation returns plain dicts, which
+# avoids building a model instance per message on long threads
+class ContentPart(TypedDict):
+    """A content part as sent by assistant-ui, e.g. {"type": "text", "text": "..."}"""
+    type: str
+    text: NotRequired[Annotated[str, Field(max_length=MAX_MESSAGE_CHARS)]]
+
+
+class Message(TypedDict):
+    role: Literal["user", "assistant", "system"]
+    content: Union[
+        Annotated[str, Field(max_length=MAX_MESSAGE_CHARS)],
+        Annotated[List[ContentPart], Field(max_length=MAX_CONTENT_PARTS)],
+    ]
+
+
+class MessagesRequest(TypedDict):
+    """Request body for POST /a2a/messages"""
+    messages: Annotated[List[Message], Field(min_length=1, max_length=MAX_MESSAGES)]
+
+
+messages_request_adapter = TypeAdapter(MessagesRequest)
+
+
+class PayloadTooLargeError(ValueError):
+    """Raised when messages exceed the count or character limits"""
+
+
+def parse_messages_request(body: bytes) -> List[Dict[str, str]]:
+    """
+    Decode and validate a /a2a/messages body.
+    Returns messages in the {"role", "content"} form AgentService expects.
+    Raises ValueError for malformed JSON, pydantic.ValidationError for invalid
+    messages and PayloadTooLargeError for messages over the size limits.
+    """
+    payload: Any = json_loads(body)
+    return validate_messages_request(payload)
+
+
+def validate_messages_request(payload: Any) -> List[Dict[str, str]]:
+    """Validate an already decoded {"messages": [...]} payload"""
+    # Size limits win over other errors: an over-limit payload is rejected before it is validated
+    check_size_limits(payload)
+    messages = messages_request_adapter.validate_python(payload)["messages"]
+
+    # Validation returns fresh dicts holding only role and content, so flatten in place
+    for msg in messages:
+        if not isinstance(msg["content"], str):
+            msg["content"] = message_text(msg)
+
+    return messages
+
+
+def check_size_limits(payload: Any):
+    """
+    Raise PayloadTooLargeError if a decoded payload is over the message count
+    or character limits. Malformed entries are skipped; validation reports them.
+    """
+    messages = payload.get("messages") if isinstance(payload, dict) else None
+    if not isinstance(messages, list):
+        return
+    if len(messages) > MAX_MESSAGES:
+        raise PayloadTooLargeError(f"More than {MAX_MESSAGES} messages")
+
+    total_chars = 0
+    for msg in messages:
+        content = msg.get("content") if isinstance(msg, dict) else None
+        if isinstance(content, str):
+            chars = len(content)
+        elif isinstance(content, list):
+            # Counts the same parts message_text joins
+            chars = sum([
+                len(part["text"]) for part in content
+                if isinstance(part, dict) and part.get("type") == "text" and isinstance(part.get("text"), str)
+            ])
+        else:
+            continue
+        if chars > MAX_MESSAGE_CHARS:
+            raise PayloadTooLargeError(f"Message exceeds {MAX_MESSAGE_CHARS} characters")
+        total_chars += chars
+        if total_chars > MAX_TOTAL_CHARS:
+            raise PayloadTooLargeError(f"Messages exceed {MAX_TOTAL_CHARS} characters in total")
+
+
+def is_too_long(error: ValidationError) -> bool:
+    """Whether any validation error comes from a count or length limit, which takes precedence"""
+    return any(detail["type"] in ("too_long", "string_too_long") for detail in error.errors(include_url=False))
+
+
+def message_text(message: Message) -> str:
+    """Message content flattened to plain text"""
+    content = message["content"]
+    if isinstance(content, str):
+        return content
+    if len(content) == 1:
+        # assistant-ui usually sends a single text part
+        part = content[0]
+        return part.get("text", "") if part["type"] == "text" else ""
+    return "".join([part.get("text", "") for part in content if part["type"] == "text"])
@@ -0,0 +1,177 @@
+from typing import Any, Dict, Optional, Set, Tuple
+import asyncio
+import json
+import os
+
+from fastapi import WebSocket
+from pydantic import ValidationError
+
+from agent_service.agent import AgentService
+from agent_service.resilience import error_code
+from server.schemas import (
+    json_loads,
+    validate_messages_request,
+    is_too_long,
+    PayloadTooLargeError,
+    MAX_BODY_BYTES,
+)
+
+# Per-connection limits for /a2a/ws
+MAX_WS_STREAMS = int(os.getenv("MAX_WS_STREAMS", 16))
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 256))
+
+
+class WebSocketSession:
+    """
+    Serves one /a2a/ws connection, multiplexing many conversation turns.
+
+    Client frames:
+        {"type": "start", "id": "<stream id>", "conversation_id": "...", "messages": [...]}
+        {"type": "cancel", "id": "<stream id>"}
+
+    Server frames:
+        {"type": "delta", "id": "<stream id>", "delta": "..."}
+        {"type": "done", "id": "<stream id>"}
+        {"type": "cancelled", "id": "<stream id>"}
+        {"type": "error", "id": "<stream id or null>", "error": "<code>", "message": "..."}
+
+    Each turn runs in its own task on the shared AgentService. Outgoing frames
+    pass through a bounded queue drained by a single writer, so a client that
+    stops reading pauses its turns instead of growing server memory.
+    """
+
+    def __init__(self, websocket: WebSocket, agent_service: AgentService):
+        self.websocket = websocket
+        self.agent_service = agent_service
+        # stream id -> (task, conversation id)
+        self.streams: Dict[str, Tuple[asyncio.Task, str]] = {}
+        self.active_conversations: Dict[str, asyncio.Task] = {}
+        # Turns whose reply is complete and saved but whose done frame may still be queued
+        self.generated: Set[asyncio.Task] = set()
+        self.outbox = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+
+    async def run(self):
+        """Accept the connection and serve frames until the client disconnects"""
+        await self.websocket.accept()
+        writer = asyncio.create_task(self._write_frames())
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("text")
+                if data is None:
+                    data = message.get("bytes") or b""
+                await self._handle_frame(data)
+        finally:
+            streams = [task for task, _ in self.streams.values()]
+            for task in streams:
+                task.cancel()
+            await asyncio.gather(*streams, return_exceptions=True)
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+
+    async def _write_frames(self):
+        while True:
+            frame = await self.outbox.get()
+            await self.websocket.send_text(json.dumps(frame))
+
+    async def _send(self, frame: Dict[str, Any]):
+        await self.outbox.put(frame)
+
+    async def _send_error(self, stream_id: Optional[str], code: str, message: str):
+        await self._send({"type": "error", "id": stream_id, "error": code, "message": message})
+
+    async def _handle_frame(self, data):
+        size = len(data.encode()) if isinstance(data, str) else len(data)
+        if size > MAX_BODY_BYTES:
+            await self._send_error(None, "payload_too_large", f"Frame exceeds {MAX_BODY_BYTES} bytes")
+            return
+
+        try:
+            frame = json_loads(data)
+        except ValueError:
+            await self._send_error(None, "invalid_request", "Frame must be valid JSON")
+            return
+
+        if not isinstance(frame, dict):
+            await self._send_error(None, "invalid_request", "Frame must be a JSON object")
+            return
+
+        stream_id = frame.get("id")
+        if not isinstance(stream_id, str) or not stream_id:
+            await self._send_error(None, "invalid_request", "Frame must have a non-empty string 'id'")
+            return
+
+        frame_type = frame.get("type")
+        if frame_type == "start":
+            await self._start_stream(stream_id, frame)
+        elif frame_type == "cancel":
+            await self._cancel_stream(stream_id)
+        else:
+            await self._send_error(stream_id, "invalid_request", f"Unknown frame type: {frame_type}")
+
+    async def _start_stream(self, stream_id: str, frame: Dict[str, Any]):
+        if stream_id in self.streams:
+            await self._send_error(stream_id, "duplicate_stream", f"Stream {stream_id} is already running")
+            return
+        if len(self.streams) >= MAX_WS_STREAMS:
+            await self._send_error(stream_id, "too_many_streams", f"At most {MAX_WS_STREAMS} concurrent streams per connection")
+            return
+
+        conversation_id = frame.get("conversation_id", "default")
+        if not isinstance(conversation_id, str) or not conversation_id or len(conversation_id) > 128:
+            await self._send_error(stream_id, "invalid_request", "conversation_id must be a string of 1-128 characters")
+            return
+        if conversation_id in self.active_conversations:
+            # Concurrent turns would interleave their writes to the conversation history
+            await self._send_error(stream_id, "conversation_busy", f"Conversation {conversation_id} already has a running turn")
+            return
+
+        try:
+            messages = validate_messages_request({"messages": frame.get("messages")})
+        except ValidationError as e:
+            code = "payload_too_large" if is_too_long(e) else "invalid_request"
+            await self._send_error(stream_id, code, str(e))
+            return
+        except PayloadTooLargeError as e:
+            await self._send_error(stream_id, "payload_too_large", str(e))
+            return
+
+        task = asyncio.create_task(self._run_stream(stream_id, conversation_id, messages))
+        # A done callback also runs for tasks cancelled before they start
+        task.add_done_callback(lambda _: self._finish_stream(stream_id, conversation_id, task))
+        self.streams[stream_id] = (task, conversation_id)
+        self.active_conversations[conversation_id] = task
+
+    def _finish_stream(self, stream_id: str, conversation_id: str, task: asyncio.Task):
+        self.generated.discard(task)
+        # The ids may already belong to a newer turn if this one was cancelled
+        if self.streams.get(stream_id, (None,))[0] is task:
+            del self.streams[stream_id]
+        if self.active_conversations.get(conversation_id) is task:
+            del self.active_conversations[conversation_id]
+
+    async def _cancel_stream(self, stream_id: str):
+        if stream_id not in self.streams:
+            # Already finished; its done or error frame is on the way
+            return
+        task, conversation_id = self.streams[stream_id]
+        if task in self.generated:
+            # The reply is already saved; its done frame is waiting for room in the outbox
+            return
+        # Free the ids right away so the client can start a new turn
+        self._finish_stream(stream_id, conversation_id, task)
+        if task.cancel():
+            await self._send({"type": "cancelled", "id": stream_id})
+        # Otherwise the task finished before the cancel arrived and has sent done or error
+
+    async def _run_stream(self, stream_id: str, conversation_id: str, messages):
+        try:
+            async for chunk in self.agent_service.aprocess_messages(messages, conversation_id):
+                await self._send({"type": "delta", "id": stream_id, "delta": chunk})
+            # History is written once the generator ends, so the turn can no longer be cancelled
+            self.generated.add(asyncio.current_task())
+            await self._send({"type": "done", "id": stream_id})
+        except Exception as e:
+            await self._send_error(stream_id, error_code(e), str(e))
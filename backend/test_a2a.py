@@ -1,10 +1,20 @@
 import asyncio
 import json
+import threading
 from typing import Dict, List
 import pytest
 from fastapi.testclient import TestClient
 from server.main import app
 from agent_service.agent import AgentService
+from agent_service.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    ProviderError,
+    ResilienceConfig,
+    ResilientCaller,
+)
+from agent_service.transport import HTTPTransport, TransportConfig
 
 
 def test_health_endpoint():
@@ -37,6 +47,81 @@ def test_a2a_messages_basic():
     assert response.headers["content-type"].startswith("text/event-stream")
 
 
+def test_a2a_messages_content_parts():
+    """Test that assistant-ui content parts are accepted"""
+    client = TestClient(app)
+    response = client.post(
+        "/a2a/messages",
+        json={"messages": [{"id": "1", "role": "user", "content": [{"type": "text", "text": "Hello"}]}]},
+        params={"conversation_id": "parts_test"}
+    )
+    assert response.status_code == 200
+    assert "data: [DONE]" in response.text
+
+
+def test_a2a_messages_rejects_invalid_input():
+    """Test that invalid requests get 4xx codes instead of a 500"""
+    client = TestClient(app)
+    
+    response = client.post("/a2a/messages", content=b"{not json", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    
+    response = client.post("/a2a/messages", json={"messages": []})
+    assert response.status_code == 422
+    
+    response = client.post("/a2a/messages", json={"messages": [{"role": "user"}]})
+    assert response.status_code == 422
+    
+    response = client.post("/a2a/messages", json={"messages": [{"role": "robot", "content": "Hi"}]})
+    assert response.status_code == 422
+
+
+def test_a2a_messages_rejection_stays_small():
+    """Test that a 422 does not echo the rejected input back to the client"""
+    client = TestClient(app)
+    
+    parts = [{"type": "text", "text": "a" * 30_000}, {"text": "no type"}]
+    response = client.post("/a2a/messages", json={"messages": [{"role": "user", "content": parts}] * 6})
+    assert response.status_code == 422
+    assert len(response.content) < 2_000
+
+
+def test_a2a_messages_size_limits():
+    """Test that oversized payloads are rejected with 413"""
+    from server.schemas import MAX_BODY_BYTES, MAX_MESSAGES, MAX_MESSAGE_CHARS, MAX_TOTAL_CHARS
+    client = TestClient(app)
+    
+    too_many = [{"role": "user", "content": "Hi"}] * (MAX_MESSAGES + 1)
+    response = client.post("/a2a/messages", json={"messages": too_many})
+    assert response.status_code == 413
+    
+    too_long = [{"role": "user", "content": "a" * (MAX_MESSAGE_CHARS + 1)}]
+    response = client.post("/a2a/messages", json={"messages": too_long})
+    assert response.status_code == 413
+    
+    too_long_parts = [{"role": "user", "content": [{"type": "text", "text": "a" * MAX_MESSAGE_CHARS}] * 2}]
+    response = client.post("/a2a/messages", json={"messages": too_long_parts})
+    assert response.status_code == 413
+    
+    count = MAX_TOTAL_CHARS // MAX_MESSAGE_CHARS + 1
+    too_much = [{"role": "user", "content": "a" * MAX_MESSAGE_CHARS}] * count
+    if count <= MAX_MESSAGES and len(json.dumps({"messages": too_much})) <= MAX_BODY_BYTES:
+        response = client.post("/a2a/messages", json={"messages": too_much})
+        assert response.status_code == 413
+    
+    # Size limits take precedence over other validation errors
+    mixed = [{"role": "robot", "content": "Hi"}, {"role": "user", "content": "a" * (MAX_MESSAGE_CHARS + 1)}]
+    response = client.post("/a2a/messages", json={"messages": mixed})
+    assert response.status_code == 413
+    
+    response = client.post(
+        "/a2a/messages",
+        content=b"x" * (MAX_BODY_BYTES + 1),
+        headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 413
+
+
 def test_conversation_state():
     """Test that conversation state is maintained"""
     client = TestClient(app)
@@ -105,5 +190,512 @@ def test_agent_service_conversation_management():
     assert history == []
 
 
+def test_process_messages_shares_conversation_history():
+    """Test that the sync API keeps history like the async API"""
+    agent = AgentService()
+    try:
+        response = "".join(agent.process_messages([{"role": "user", "content": "Hello"}], "sync_conv"))
+        assert response
+        list(agent.process_messages([{"role": "user", "content": "Again"}], "sync_conv"))
+        
+        history = agent.get_conversation_history("sync_conv")
+        assert [msg["role"] for msg in history] == ["user", "assistant", "user", "assistant"]
+        assert history[1]["content"] == response
+    finally:
+        agent.close()
+
+
+def test_process_messages_concurrent_callers():
+    """Test that sync callers in a worker pool can generate concurrently"""
+    from concurrent.futures import ThreadPoolExecutor
+    
+    agent = AgentService()
+    try:
+        def run(i):
+            return "".join(agent.process_messages([{"role": "user", "content": f"Message {i}"}], f"pool_{i}"))
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(run, range(8)))
+        
+        assert all(responses)
+        assert all(len(agent.get_conversation_history(f"pool_{i}")) == 2 for i in range(8))
+    finally:
+        agent.close()
+
+
+def test_process_messages_early_close():
+    """Test that abandoning a sync stream cancels the generation"""
+    agent = AgentService()
+    try:
+        stream = agent.process_messages([{"role": "user", "content": "Hello"}], "abandoned")
+        assert next(stream)
+        stream.close()
+        assert agent.get_conversation_history("abandoned") == []
+        
+        async def pending_tasks():
+            # Give the cancellation a moment to reach the pump task
+            await asyncio.sleep(0.05)
+            return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        
+        assert asyncio.run_coroutine_threadsafe(pending_tasks(), agent._loop).result() == []
+    finally:
+        agent.close()
+
+
+def test_process_messages_close_during_generation():
+    """Test that closing the service mid-stream raises instead of truncating the reply"""
+    agent = AgentService()
+    stream = agent.process_messages([{"role": "user", "content": "Hello"}], "closed_mid_stream")
+    assert next(stream)
+    agent.close()
+    
+    with pytest.raises(RuntimeError):
+        for _ in stream:
+            pass
+
+
+async def _start_stand_in_endpoint(delay: float = 0.0):
+    """
+    Start a local keep-alive HTTP endpoint that counts new connections.
+    Returns a coroutine function that stops it, its URL and the counters.
+    """
+    stats = {"connections": 0, "closed": 0}
+    handlers = set()
+    
+    async def handle(reader, writer):
+        handlers.add(asyncio.current_task())
+        stats["connections"] += 1
+        try:
+            while True:
+                # Read request head; the test requests have no body
+                head = await reader.readuntil(b"\r\n\r\n")
+                if not head:
+                    break
+                await asyncio.sleep(delay)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: keep-alive\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            # The client closed the connection
+            stats["closed"] += 1
+        finally:
+            writer.close()
+            handlers.discard(asyncio.current_task())
+    
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    
+    async def stop():
+        server.close()
+        # Handlers for kept-alive connections would otherwise outlive the loop
+        for task in list(handlers):
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        await server.wait_closed()
+    
+    return stop, f"http://127.0.0.1:{port}/", stats
+
+
+def test_transport_reuses_connections():
+    """Test that the shared client keeps connections alive across requests"""
+    async def run():
+        stop_server, url, server_stats = await _start_stand_in_endpoint()
+        transport = HTTPTransport(TransportConfig())
+        try:
+            for _ in range(5):
+                response = await transport.client.get(url)
+                assert response.text == "ok"
+            
+            stats = transport.stats()
+            assert server_stats["connections"] == 1
+            assert stats["requests"] == 5
+            assert stats["connections_opened"] == 1
+            assert stats["idle_connections"] == 1
+        finally:
+            await transport.aclose()
+            await stop_server()
+    
+    asyncio.run(run())
+
+
+def test_transport_shared_across_event_loops():
+    """Test that one client works from several event loops, with a pool per loop"""
+    async def start_server():
+        return await _start_stand_in_endpoint()
+    
+    # Serve from a background loop so each asyncio.run below is a fresh client loop
+    server_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=server_loop.run_forever, daemon=True)
+    thread.start()
+    stop_server, url, server_stats = asyncio.run_coroutine_threadsafe(start_server(), server_loop).result()
+    transport = HTTPTransport(TransportConfig())
+    
+    async def fetch():
+        response = await transport.client.get(url)
+        return response.text
+    
+    try:
+        assert asyncio.run(fetch()) == "ok"
+        assert asyncio.run(fetch()) == "ok"
+        assert server_stats["connections"] == 2
+        assert transport.stats()["requests"] == 2
+    finally:
+        asyncio.run_coroutine_threadsafe(stop_server(), server_loop).result()
+        server_loop.call_soon_threadsafe(server_loop.stop)
+        thread.join()
+        server_loop.close()
+
+
+def test_shutdown_closes_background_loop_pool(monkeypatch):
+    """Test that server shutdown closes connections opened by the sync API's loop"""
+    import time
+    import server.main
+    
+    async def start_server():
+        return await _start_stand_in_endpoint()
+    
+    server_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=server_loop.run_forever, daemon=True)
+    thread.start()
+    stop_server, url, server_stats = asyncio.run_coroutine_threadsafe(start_server(), server_loop).result()
+    agent = AgentService()
+    monkeypatch.setattr(server.main, "agent_service", agent)
+    
+    async def fetch():
+        response = await agent.transport.client.get(url)
+        return response.text
+    
+    try:
+        assert asyncio.run_coroutine_threadsafe(fetch(), agent._ensure_loop()).result() == "ok"
+        asyncio.run(server.main.shutdown())
+        deadline = time.monotonic() + 2
+        while server_stats["closed"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert server_stats["closed"] == 1
+    finally:
+        asyncio.run_coroutine_threadsafe(stop_server(), server_loop).result()
+        server_loop.call_soon_threadsafe(server_loop.stop)
+        thread.join()
+        server_loop.close()
+
+
+def test_transport_first_byte_timeout_defaults_to_read_timeout():
+    """Test that the first-byte timeout does not undercut the read timeout by default"""
+    config = TransportConfig(read_timeout=90.0)
+    assert config.first_byte_timeout == 90.0
+
+
+def test_transport_pool_limit():
+    """Test that concurrent requests never exceed the pool size"""
+    async def run():
+        stop_server, url, server_stats = await _start_stand_in_endpoint(delay=0.05)
+        transport = HTTPTransport(TransportConfig(max_connections=2, max_keepalive_connections=2))
+        try:
+            responses = await asyncio.gather(*[transport.client.get(url) for _ in range(6)])
+            assert all(response.status_code == 200 for response in responses)
+            assert server_stats["connections"] == 2
+        finally:
+            await transport.aclose()
+            await stop_server()
+    
+    asyncio.run(run())
+
+
+def test_transport_first_byte_timeout():
+    """Test that a slow provider fails with a read timeout"""
+    import httpx
+    
+    async def run():
+        stop_server, url, _ = await _start_stand_in_endpoint(delay=1.0)
+        transport = HTTPTransport(TransportConfig(first_byte_timeout=0.1))
+        try:
+            with pytest.raises(httpx.ReadTimeout):
+                await transport.client.get(url)
+        finally:
+            await transport.aclose()
+            await stop_server()
+    
+    asyncio.run(run())
+
+
+def test_transport_stats_endpoint():
+    """Test the transport stats endpoint"""
+    client = TestClient(app)
+    response = client.get("/a2a/transport/stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert "requests" in data
+    assert "connections_opened" in data
+
+
+class _StatusError(Exception):
+    """Stand-in for a provider SDK error carrying an HTTP status"""
+    
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def _flaky_operation(failures: List[Exception]):
+    """Return an operation that raises the given errors in turn, then succeeds"""
+    calls = {"count": 0}
+    
+    async def operation():
+        calls["count"] += 1
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+    
+    return operation, calls
+
+
+def test_resilience_retries_transient_errors():
+    """Test that 429/5xx errors are retried with backoff"""
+    caller = ResilientCaller(ResilienceConfig(max_attempts=3, backoff_base=0.001))
+    operation, calls = _flaky_operation([_StatusError(429), _StatusError(503)])
+    
+    assert asyncio.run(caller.call(operation)) == "ok"
+    assert calls["count"] == 3
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_resilience_does_not_retry_client_errors():
+    """Test that non-retryable errors fail on the first attempt"""
+    caller = ResilientCaller(ResilienceConfig(max_attempts=3, backoff_base=0.001))
+    operation, calls = _flaky_operation([_StatusError(400)])
+    
+    with pytest.raises(ProviderError):
+        asyncio.run(caller.call(operation))
+    assert calls["count"] == 1
+
+
+def test_resilience_deadline():
+    """Test that a hanging provider call fails at the request deadline"""
+    caller = ResilientCaller(ResilienceConfig(deadline=0.05))
+    
+    async def hang():
+        await asyncio.sleep(10)
+    
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(caller.call(hang))
+
+
+def test_circuit_breaker_fails_fast_and_recovers():
+    """Test that the circuit opens after repeated failures and half-opens after the reset timeout"""
+    now = {"time": 0.0}
+    caller = ResilientCaller(ResilienceConfig(max_attempts=1, failure_threshold=2, reset_timeout=10.0))
+    caller.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=lambda: now["time"])
+    
+    for _ in range(2):
+        operation, _ = _flaky_operation([_StatusError(503)])
+        with pytest.raises(ProviderError):
+            asyncio.run(caller.call(operation))
+    assert caller.breaker.state == CircuitBreaker.OPEN
+    
+    operation, calls = _flaky_operation([])
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(caller.call(operation))
+    assert calls["count"] == 0
+    
+    now["time"] = 10.0
+    assert caller.breaker.state == CircuitBreaker.HALF_OPEN
+    assert asyncio.run(caller.call(operation)) == "ok"
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_counts_requests_not_attempts():
+    """Test that one request failing all its retries counts as a single failure"""
+    caller = ResilientCaller(ResilienceConfig(max_attempts=3, backoff_base=0.001, failure_threshold=2))
+    operation, calls = _flaky_operation([_StatusError(503)] * 3)
+    
+    with pytest.raises(ProviderError):
+        asyncio.run(caller.call(operation))
+    assert calls["count"] == 3
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_a2a_messages_error_event(monkeypatch):
+    """Test that provider failures are sent as an SSE error event"""
+    import server.main
+    
+    async def failing_process_messages(messages, conversation_id="default"):
+        raise CircuitOpenError("LLM provider is temporarily unavailable")
+        yield
+    
+    monkeypatch.setattr(server.main.agent_service, "aprocess_messages", failing_process_messages)
+    client = TestClient(app)
+    response = client.post(
+        "/a2a/messages",
+        json={"messages": [{"role": "user", "content": "Hello"}]},
+        params={"conversation_id": "error_test"}
+    )
+    assert response.status_code == 200
+    assert "event: error" in response.text
+    assert '"error": "provider_unavailable"' in response.text
+    assert "Mock response" not in response.text
+
+
+def _collect_ws_streams(websocket, stream_ids):
+    """Read frames until every stream has finished, returning deltas and final frame types"""
+    deltas = {stream_id: "" for stream_id in stream_ids}
+    finished = {}
+    while len(finished) < len(stream_ids):
+        frame = websocket.receive_json()
+        if frame["type"] == "delta":
+            deltas[frame["id"]] += frame["delta"]
+        else:
+            finished[frame["id"]] = frame["type"]
+    return deltas, finished
+
+
+def test_websocket_multiplexes_conversations():
+    """Test that one connection streams several conversations concurrently"""
+    client = TestClient(app)
+    with client.websocket_connect("/a2a/ws") as websocket:
+        for i in range(3):
+            websocket.send_json({
+                "type": "start",
+                "id": f"turn_{i}",
+                "conversation_id": f"ws_conv_{i}",
+                "messages": [{"role": "user", "content": f"Hello {i}"}],
+            })
+        deltas, finished = _collect_ws_streams(websocket, [f"turn_{i}" for i in range(3)])
+    
+    assert finished == {f"turn_{i}": "done" for i in range(3)}
+    assert all(deltas.values())
+    
+    import server.main
+    history = server.main.agent_service.get_conversation_history("ws_conv_0")
+    assert history[-1] == {"role": "assistant", "content": deltas["turn_0"]}
+
+
+def test_websocket_cancel():
+    """Test in-band cancellation of one stream while another keeps running"""
+    client = TestClient(app)
+    with client.websocket_connect("/a2a/ws") as websocket:
+        for stream_id in ["keep", "stop"]:
+            websocket.send_json({
+                "type": "start",
+                "id": stream_id,
+                "conversation_id": f"ws_cancel_{stream_id}",
+                "messages": [{"role": "user", "content": "Tell me something"}],
+            })
+        websocket.send_json({"type": "cancel", "id": "stop"})
+        _, finished = _collect_ws_streams(websocket, ["keep", "stop"])
+    
+    assert finished == {"keep": "done", "stop": "cancelled"}
+
+
+def test_websocket_cancel_keeps_history_clean():
+    """Test that a cancelled turn is not saved as a completed reply"""
+    import server.main
+    
+    client = TestClient(app)
+    with client.websocket_connect("/a2a/ws") as websocket:
+        websocket.send_json({
+            "type": "start",
+            "id": "partial",
+            "conversation_id": "ws_cancel_history",
+            "messages": [{"role": "user", "content": "Tell me something"}],
+        })
+        frame = websocket.receive_json()
+        assert frame["type"] == "delta"
+        websocket.send_json({"type": "cancel", "id": "partial"})
+        _, finished = _collect_ws_streams(websocket, ["partial"])
+    
+    assert finished == {"partial": "cancelled"}
+    assert server.main.agent_service.get_conversation_history("ws_cancel_history") == []
+
+
+def test_websocket_cancel_after_finish_sends_nothing():
+    """Test that cancelling a turn that already finished does not send 'cancelled' after 'done'"""
+    from server.websocket import WebSocketSession
+    
+    async def run():
+        session = WebSocketSession(websocket=None, agent_service=None)
+        
+        async def finished_turn():
+            return None
+        
+        task = asyncio.create_task(finished_turn())
+        await task
+        # The done callback that would remove the stream has not run yet
+        session.streams["late"] = (task, "ws_late")
+        session.active_conversations["ws_late"] = task
+        
+        await session._cancel_stream("late")
+        assert session.outbox.empty()
+        assert session.streams == {}
+    
+    asyncio.run(run())
+
+
+def test_websocket_cancel_while_outbox_full():
+    """Test that a turn whose reply was saved is not acknowledged as cancelled under backpressure"""
+    from server.websocket import WebSocketSession
+    
+    class SavingAgent:
+        def __init__(self):
+            self.history = {}
+        
+        async def aprocess_messages(self, messages, conversation_id):
+            yield "reply"
+            self.history[conversation_id] = messages + [{"role": "assistant", "content": "reply"}]
+    
+    async def run():
+        agent = SavingAgent()
+        session = WebSocketSession(websocket=None, agent_service=agent)
+        session.outbox = asyncio.Queue(maxsize=1)
+        
+        await session._start_stream("full", {"conversation_id": "ws_full", "messages": [{"role": "user", "content": "Hi"}]})
+        task, _ = session.streams["full"]
+        # The delta fills the outbox, so the done frame waits for the writer
+        while "ws_full" not in agent.history:
+            await asyncio.sleep(0)
+        
+        await asyncio.wait_for(session._cancel_stream("full"), timeout=1)
+        frames = [await session.outbox.get(), await session.outbox.get()]
+        await task
+        # Let the done callback run
+        await asyncio.sleep(0)
+        
+        assert [frame["type"] for frame in frames] == ["delta", "done"]
+        assert not task.cancelled()
+        assert session.streams == {}
+    
+    asyncio.run(run())
+
+
+def test_websocket_frame_limit_counts_bytes(monkeypatch):
+    """Test that the frame size limit counts encoded bytes, not characters"""
+    import server.websocket
+    
+    monkeypatch.setattr(server.websocket, "MAX_BODY_BYTES", 100)
+    client = TestClient(app)
+    with client.websocket_connect("/a2a/ws") as websocket:
+        # 60 characters, but 180 bytes in UTF-8
+        websocket.send_text("\u20ac" * 60)
+        frame = websocket.receive_json()
+        assert frame["error"] == "payload_too_large"
+
+
+def test_websocket_rejects_invalid_frames():
+    """Test that invalid frames get error frames without closing the connection"""
+    client = TestClient(app)
+    with client.websocket_connect("/a2a/ws") as websocket:
+        websocket.send_text("{not json")
+        frame = websocket.receive_json()
+        assert frame["type"] == "error"
+        assert frame["error"] == "invalid_request"
+        
+        websocket.send_json({"type": "start", "id": "bad", "messages": []})
+        frame = websocket.receive_json()
+        assert frame == {**frame, "type": "error", "id": "bad", "error": "invalid_request"}
+        
+        websocket.send_json({"type": "start", "id": "first", "conversation_id": "ws_busy", "messages": [{"role": "user", "content": "Hi"}]})
+        websocket.send_json({"type": "start", "id": "second", "conversation_id": "ws_busy", "messages": [{"role": "user", "content": "Hi"}]})
+        _, finished = _collect_ws_streams(websocket, ["first", "second"])
+        assert finished == {"first": "done", "second": "error"}
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -33,6 +33,35 @@ const ModelAdapter: ChatModelAdapter = {
     const decoder = new TextDecoder();
     let buffer = "";
     let accumulatedText = "";
+    let eventType = "message";
+
+    const processLine = (line: string) => {
+      if (line.startsWith('event: ')) {
+        eventType = line.slice(7).trim();
+      } else if (line.startsWith('data: ')) {
+        const data = line.slice(6); // Remove 'data: ' prefix
+
+        if (eventType === 'error') {
+          // The backend reports provider failures as {"error": code, "message": string}
+          let message = data;
+          try {
+            message = JSON.parse(data).message || data;
+          } catch (e) {
+            // Keep the raw payload as the message
+          }
+          throw new Error(message);
+        }
+
+        // Skip empty data and [DONE] markers
+        if (data.trim() && data.trim() !== '[DONE]') {
+          // Accumulate the received text chunk
+          accumulatedText += data;
+        }
+      } else if (line === '') {
+        // A blank line ends the current event
+        eventType = "message";
+      }
+    };
 
     try {
       while (true) {
@@ -44,32 +73,15 @@ const ModelAdapter: ChatModelAdapter = {
           buffer = lines.pop() || ''; // Keep last incomplete line in buffer
           
           for (const line of lines) {
-            if (line.startsWith('data: ')) {
-              const data = line.slice(6); // Remove 'data: ' prefix
-              
-              // Skip empty data and [DONE] markers
-              if (data.trim() && data.trim() !== '[DONE]') {
-                // Accumulate the received text chunk
-                accumulatedText += data;
-              }
-            }
+            processLine(line);
           }
         }
         
         if (done) {
           // Process any remaining content in the buffer after stream ends
           if (buffer.trim()) {
-            const remainingLines = buffer.split('\n');
-            for (const line of remainingLines) {
-              if (line.startsWith('data: ')) {
-                const data = line.slice(6); // Remove 'data: ' prefix
-                
-                // Skip empty data and [DONE] markers
-                if (data.trim() && data.trim() !== '[DONE]') {
-                  // Accumulate the received text chunk
-                  accumulatedText += data;
-                }
-              }
+            for (const line of buffer.split('\n')) {
+              processLine(line);
             }
           }
           break;